@@ -4,20 +4,32 @@ Ported from the legacy Tkinter helper: keeps placement rules, mix math, and expo
 """
 
 import re
-from collections import defaultdict
-from math import ceil
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, TypedDict
 
+import orjson
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 
+from .placement import (
+    PLATE_ROWS,
+    WELLS_PER_PLATE,
+    WELLS_PER_ROW,
+    Layout,
+    build_gene_block,
+    plate_name,
+    plate_positions,
+)
+
+try:  # optional: RE2 matches in linear time (no backtracking on hostile pastes)
+    import re2 as _re_engine
+except ImportError:
+    _re_engine = re
+
 APP_TITLE = "qPCR Planner API"
 
-PLATE_ROWS = list("ABCDEFGHIJKLMNOP")  # 16 rows
-PLATE_COLS = list(range(1, 25))        # 24 cols
-WELLS_PER_ROW = len(PLATE_COLS)
-WELLS_PER_PLATE = len(PLATE_ROWS) * len(PLATE_COLS)  # 384
 
 class Gene(BaseModel):
     name: str
@@ -37,7 +49,9 @@ class PlanRequest(BaseModel):
     genes: List[Gene] = []
     gene_plate_overrides: Dict[str, int] = {}  # gene -> desired plate number (1-based)
 
-class MixRow(BaseModel):
+class MixRow(TypedDict):
+    """One /plan mix row; a plain dict at runtime (no per-row validation)."""
+
     Gene: str
     Chemistry: str
     placed_reactions: int
@@ -66,7 +80,22 @@ CHEMISTRY = {
     },
 }
 
-app = FastAPI(title=APP_TITLE)
+# Mix-row field -> per-reaction reagent, in response order.
+MIX_FIELDS = (
+    ("master_mix_2x", "2X master mix"),
+    ("rna_free_h2o", "RNAse-free H2O"),
+    ("probe_10uM", "10 µM probe"),
+    ("fwd_10uM", "10 µM Forward"),
+    ("rev_10uM", "10 µM Reverse"),
+)
+CHEM_VECTORS = {name: tuple(per[reagent] for _, reagent in MIX_FIELDS) for name, per in CHEMISTRY.items()}
+
+# Fixed trailing sections; optional ones are included by multiplying with 0/1.
+_RT_SEC = (("Negative", ("RT−",)),)
+_RNA_SEC = (("Negative", ("RNA−",)),)
+_BLANK_SEC = (("Blank", ("Blank",)),)
+
+app = FastAPI(title=APP_TITLE, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -76,13 +105,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-COMPACT_SAMPLE_RE = re.compile(
-    r"^(?P<label>[A-Za-z0-9]+)"
+# Case-insensitivity is inline so the pattern compiles the same under re and re2.
+COMPACT_SAMPLE_RE = _re_engine.compile(
+    r"(?i)^(?P<label>[A-Za-z0-9]+)"
     r"(?P<sex>male|female)"
     r"(?P<treatment>tnf|saline)"
-    r"(?P<age>middleage|oldage)$",
-    re.IGNORECASE,
+    r"(?P<age>middleage|oldage)$"
 )
+_TAB_COMMA_RE = re.compile(r"[\t,]+")
+_WS_RE = re.compile(r"\s+")
+
+
+def _parse_compact(compact: str) -> Optional[Tuple[str, str, str, str]]:
+    """Split a whitespace-free compact sample into (label, sex, treatment, age).
+
+    Equivalent to COMPACT_SAMPLE_RE but walks the fixed vocabulary back from
+    the end with str.endswith instead of entering the regex engine. Like the
+    regex's greedy label, "male" is preferred over "female" while a label
+    remains ("321female..." -> "321fe" + "male"). Non-ASCII input, where
+    case folding can change lengths, is left to the regex.
+    """
+
+    if not compact.isascii():
+        m = COMPACT_SAMPLE_RE.match(compact)
+        return m.group("label", "sex", "treatment", "age") if m else None
+
+    low = compact.lower()
+    end = len(low)
+    for age in ("middleage", "oldage"):
+        if low.endswith(age, 0, end):
+            age_at = end - len(age)
+            break
+    else:
+        return None
+    for treatment in ("tnf", "saline"):
+        if low.endswith(treatment, 0, age_at):
+            treatment_at = age_at - len(treatment)
+            break
+    else:
+        return None
+    for sex in ("male", "female"):
+        sex_at = treatment_at - len(sex)
+        if sex_at > 0 and low.endswith(sex, 0, treatment_at) and compact[:sex_at].isalnum():
+            return (
+                compact[:sex_at],
+                compact[sex_at:treatment_at],
+                compact[treatment_at:age_at],
+                compact[age_at:],
+            )
+    return None
 
 
 def _split_sample_line(raw: str) -> List[str]:
@@ -90,7 +161,7 @@ def _split_sample_line(raw: str) -> List[str]:
 
     Priority:
     1) Tabs or commas keep intra-value spaces intact.
-    2) Compact patterns like 321Maletnfold age are unpacked via regex.
+    2) Compact patterns like 321Maletnfold age are unpacked (see _parse_compact).
     3) Fallback: whitespace split, with "old age"/"middle age" re-joined.
     """
 
@@ -98,23 +169,29 @@ def _split_sample_line(raw: str) -> List[str]:
     if not line or line.startswith("#"):
         return []
 
-    if "\t" in line or "," in line:
-        return [p.strip() for p in re.split(r"[\t,]+", line) if p.strip()]
+    has_tab = "\t" in line
+    has_comma = "," in line
+    if has_tab or has_comma:
+        if has_tab and has_comma:
+            pieces = _TAB_COMMA_RE.split(line)
+        else:
+            pieces = line.split("\t" if has_tab else ",")
+        return [p.strip() for p in pieces if p.strip()]
 
     # Compact case: remove internal spaces so "tnfold age" still matches.
-    compact = re.sub(r"\s+", "", line)
-    m = COMPACT_SAMPLE_RE.match(compact)
-    if m:
-        age_key = m.group("age").lower()
-        age = "middle age" if "middle" in age_key else "old age"
-        return [
-            m.group("label"),
-            m.group("sex").capitalize(),
-            m.group("treatment").lower(),
-            age,
-        ]
-
-    parts = [p for p in re.split(r"\s+", line) if p]
+    compact = _WS_RE.sub("", line)
+    low = compact.lower()
+    # Cheap vocabulary check ("female" contains "male") before attempting the compact parse.
+    if "male" in low and ("tnf" in low or "saline" in low) and "age" in low:
+        parsed = _parse_compact(compact)
+    else:
+        parsed = None
+    if parsed:
+        label, sex, treatment, age_key = parsed
+        age = "middle age" if "middle" in age_key.lower() else "old age"
+        return [label, sex.capitalize(), treatment.lower(), age]
+
+    parts = [p for p in _WS_RE.split(line) if p]
     if len(parts) >= 2 and parts[-2].lower() in {"old", "middle"} and parts[-1].lower() == "age":
         parts = parts[:-2] + [f"{parts[-2]} {parts[-1]}"]
     return parts
@@ -125,7 +202,8 @@ def parse_samples(lines: List[str]) -> Tuple[List[str], Dict[str, str], Dict[str
     (ordered names, name->group, name->extras[], headers_for_extras).
 
     - First token is always treated as the sample label.
-    - Extras are every remaining token, preserving order.
+    - Extras are every remaining token, preserving order, padded with "" so
+      every sample has the same number of extras.
     - If only one extra column exists, it keeps the legacy name "Group".
     """
 
@@ -147,6 +225,10 @@ def parse_samples(lines: List[str]) -> Tuple[List[str], Dict[str, str], Dict[str
             group_map[label] = extras[0]
         max_extras = max(max_extras, len(extras))
 
+    for label, extras in extras_map.items():
+        if len(extras) < max_extras:
+            extras_map[label] = extras + [""] * (max_extras - len(extras))
+
     if max_extras == 1:
         headers = ["Group"]
     else:
@@ -154,8 +236,22 @@ def parse_samples(lines: List[str]) -> Tuple[List[str], Dict[str, str], Dict[str
 
     return names, group_map, extras_map, headers
 
-@app.post("/plan")
-async def plan(req: PlanRequest):
+def _seq_labels(prefix: str, n: int) -> List[str]:
+    """prefix1..prefixN, formatted in one %-pass instead of n f-strings."""
+    if n <= 0:
+        return []
+    return ((prefix + "%d ") * n % tuple(range(1, n + 1))).split()
+
+
+@lru_cache(maxsize=64)
+def _compute_plan(req_key: str) -> dict:
+    """Build the /plan response for a canonical request key (see plan()).
+
+    The planner is a pure function of its inputs, so repeated clicks on
+    "Compute" with unchanged inputs are served from this bounded cache.
+    """
+
+    req = PlanRequest.model_validate_json(req_key)
     if req.replicates < 1:
         raise HTTPException(status_code=400, detail="Replicates must be ≥ 1.")
     labels_per_row = WELLS_PER_ROW // req.replicates
@@ -167,22 +263,25 @@ async def plan(req: PlanRequest):
         if not samples:
             raise HTTPException(status_code=400, detail="No samples parsed from pasted list.")
     else:
-        samples = [f"S{i}" for i in range(1, req.num_samples + 1)]
+        samples = _seq_labels("S", req.num_samples)
         sample_group_map = {}
         sample_extra_map = {}
         sample_headers: List[str] = []
 
-    max_extras = len(sample_headers)
+    empty_extras = [""] * len(sample_headers)  # parse_samples already padded every sample to this length
 
     if not req.genes:
         raise HTTPException(status_code=400, detail="At least one gene is required.")
 
     genes = [(g.name.strip(), g.chemistry.strip()) for g in req.genes if g.name.strip()]
-    seen = set()
-    for g, _ in genes:
-        if g in seen:
-            raise HTTPException(status_code=400, detail=f"Duplicate gene: {g}")
-        seen.add(g)
+    gene_names = [g for g, _ in genes]
+    if len(set(gene_names)) != len(gene_names):
+        # Only walk the names when a duplicate exists, to report the first repeat.
+        seen = set()
+        for g in gene_names:
+            if g in seen:
+                raise HTTPException(status_code=400, detail=f"Duplicate gene: {g}")
+            seen.add(g)
 
     gene_groups: List[List[Tuple[str, str]]] = []
     if req.place_gapdh_separate:
@@ -195,31 +294,40 @@ async def plan(req: PlanRequest):
     else:
         gene_groups.append(genes)
 
-    all_layout = []
-    all_mix: List[dict] = []
-    plates_dict: Dict[str, List[dict]] = defaultdict(list)
+    layout = Layout()
+    placed_by_gene: List[Tuple[str, str, int]] = []  # (gene, chemistry, placed reactions)
     plate_counter = 0
 
+    # Every gene gets the same labels on a fresh plate, so sections and well
+    # positions are computed once and shared by all genes.
+    std_labels = _seq_labels("Std", req.num_standards)
+    pos_labels = _seq_labels("Pos", req.num_pos)
+
+    sections = (
+        (("Sample", samples), ("Standard", std_labels), ("Positive", pos_labels))
+        + _RT_SEC * int(req.include_rtneg)
+        + _RNA_SEC * int(req.include_rnaneg)
+        + _BLANK_SEC
+    )
+    # Labels are never empty strings and empty sections add nothing when flattened.
+    flat_labels = [(t, lab) for t, labs in sections for lab in labs]
+
+    total_labels = len(flat_labels)
+    rows_needed = -(-total_labels // labels_per_row)
+    fits = rows_needed <= len(PLATE_ROWS)
+    # fits is exactly plate_positions' no-overflow condition; genes report the overflow below.
+    label_positions = plate_positions(total_labels, req.replicates) if fits else []
+
+    block = build_gene_block(
+        flat_labels, label_positions, req.replicates, sample_group_map, sample_extra_map, empty_extras
+    )
+
     for group_genes in gene_groups:
         for gene, chem_key in group_genes:
             if chem_key not in CHEMISTRY:
                 raise HTTPException(status_code=400, detail=f"Unknown chemistry for {gene}: {chem_key}")
 
-            sections = []
-            sections.append(("Sample", samples))
-            sections.append(("Standard", [f"Std{n}" for n in range(1, req.num_standards + 1)]))
-            if req.num_pos > 0:
-                sections.append(("Positive", [f"Pos{n}" for n in range(1, req.num_pos + 1)]))
-            if req.include_rtneg:
-                sections.append(("Negative", ["RT−"]))
-            if req.include_rnaneg:
-                sections.append(("Negative", ["RNA−"]))
-            sections.append(("Blank", ["Blank"]))
-            sections = [(t, [x for x in xs if x]) for (t, xs) in sections if xs]
-
-            total_labels = sum(len(lbls) for _, lbls in sections)
-            rows_needed = ceil(total_labels / labels_per_row)
-            if rows_needed > len(PLATE_ROWS):
+            if not fits:
                 raise HTTPException(
                     status_code=400,
                     detail=(
@@ -233,67 +341,37 @@ async def plan(req: PlanRequest):
                 plate_counter = override_plate - 1
 
             plate_counter += 1
-            current_plate = f"Plate {plate_counter}"
-
-            chem = CHEMISTRY[chem_key]
-            row_idx = 0
-            col_idx = 0
-            placed_for_gene = 0
-
-            def place_block(label_type: str, labels: List[str]):
-                nonlocal row_idx, col_idx, placed_for_gene
-                for lab in labels:
-                    if col_idx + req.replicates > WELLS_PER_ROW:
-                        col_idx = 0
-                        row_idx += 1
-                    if row_idx >= len(PLATE_ROWS):
-                        raise HTTPException(status_code=400, detail="Plate overflow while placing wells.")
-                    extras = sample_extra_map.get(lab, []) if label_type == "Sample" else []
-                    if len(extras) < max_extras:
-                        extras = extras + [""] * (max_extras - len(extras))
-                    for r in range(req.replicates):
-                        well = f"{PLATE_ROWS[row_idx]}{PLATE_COLS[col_idx + r]}"
-                        record = {
-                            "Plate": current_plate,
-                            "Well": well,
-                            "Gene": gene,
-                            "Type": label_type,
-                            "Label": lab,
-                            "Replicate": r + 1,
-                        }
-                        if label_type == "Sample":
-                            record["Group"] = sample_group_map.get(lab, "")
-                            record["Extras"] = extras
-                        all_layout.append(record)
-                        plates_dict[current_plate].append(record)
-                        placed_for_gene += 1
-                    col_idx += req.replicates
-                    if col_idx >= WELLS_PER_ROW:
-                        col_idx = 0
-                        row_idx += 1
-
-            for label_type, labels in sections:
-                place_block(label_type, labels)
-
-            factor = 1.0 + (req.overage_pct / 100.0)
-            mix_equiv_rxn = placed_for_gene * factor
-            all_mix.append({
-                "Gene": gene,
-                "Chemistry": chem_key,
-                "placed_reactions": placed_for_gene,
-                "mix_factor": factor,
-                "mix_equiv_rxn": mix_equiv_rxn,
-                "master_mix_2x":  chem["2X master mix"]  * mix_equiv_rxn,
-                "rna_free_h2o":   chem["RNAse-free H2O"] * mix_equiv_rxn,
-                "probe_10uM":     chem["10 µM probe"]    * mix_equiv_rxn,
-                "fwd_10uM":       chem["10 µM Forward"]  * mix_equiv_rxn,
-                "rev_10uM":       chem["10 µM Reverse"]  * mix_equiv_rxn,
-            })
-
-    summary = [
-        {"plate": p, "used": len(plates_dict[p]), "empty": WELLS_PER_PLATE - len(plates_dict[p])}
-        for p in sorted(plates_dict.keys(), key=lambda x: int(x.split()[1]))
-    ]
+            layout.add_gene(plate_counter, gene, block)
+            placed_by_gene.append((gene, chem_key, len(block.wells)))
+
+    factor = 1.0 + (req.overage_pct / 100.0)
+    all_mix: List[MixRow] = []
+    for gene, chem_key, placed in placed_by_gene:
+        mix_equiv_rxn = placed * factor
+        master_mix, h2o, probe, fwd, rev = (per * mix_equiv_rxn for per in CHEM_VECTORS[chem_key])
+        all_mix.append({
+            "Gene": gene,
+            "Chemistry": chem_key,
+            "placed_reactions": placed,
+            "mix_factor": factor,
+            "mix_equiv_rxn": mix_equiv_rxn,
+            "master_mix_2x": master_mix,
+            "rna_free_h2o": h2o,
+            "probe_10uM": probe,
+            "fwd_10uM": fwd,
+            "rev_10uM": rev,
+        })
+
+    all_layout = layout.records()
+    # Plate ids only ever increase, so each plate is one contiguous run of all_layout.
+    plates_dict: Dict[str, List[dict]] = {}
+    summary = []
+    start = 0
+    for plate_id, used in layout.plate_counts().items():
+        name = plate_name(plate_id)
+        plates_dict[name] = all_layout[start:start + used]
+        summary.append({"plate": name, "used": used, "empty": WELLS_PER_PLATE - used})
+        start += used
 
     return {
         "layout": all_layout,
@@ -301,9 +379,21 @@ async def plan(req: PlanRequest):
         "plates": plates_dict,
         "summary": summary,
         "sample_headers": sample_headers,
-        "inputs": req.dict(),
     }
 
+@app.post("/plan")
+def plan(req: PlanRequest, echo_inputs: bool = False):
+    # pydantic-core emits fields in model order (and encodes ints of any size),
+    # so equal requests share a cache entry regardless of body field order.
+    result = _compute_plan(req.model_dump_json())
+    # Returned as a response so FastAPI skips its Python jsonable_encoder walk:
+    # the (JSON-native) payload goes straight to orjson.
+    if echo_inputs:
+        # Opt-in: the echo repeats the whole request, pasted sample list included.
+        # Fragment: pydantic-core's JSON is embedded as is (orjson rejects ints beyond 64 bits).
+        return ORJSONResponse({**result, "inputs": orjson.Fragment(req.model_dump_json())})
+    return ORJSONResponse(result)
+
 @app.get("/health")
-async def health():
+def health():
     return {"status": "ok"}
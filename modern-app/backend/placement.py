@@ -0,0 +1,148 @@
+"""
+Plate placement core for the planner API: plate geometry, well positions, and
+the column-wise layout buffers.
+
+Kept free of FastAPI/Pydantic and fully annotated so it runs as plain Python
+or can be compiled in place with mypyc (`mypyc placement.py` inside backend/).
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Final, List, Optional, Tuple
+
+# Final: module constants an AOT build (mypyc) can bind once instead of re-reading globals.
+PLATE_ROWS: Final = list("ABCDEFGHIJKLMNOP")  # 16 rows
+PLATE_COLS: Final = list(range(1, 25))        # 24 cols
+WELLS_PER_ROW: Final = len(PLATE_COLS)
+WELLS_PER_PLATE: Final = len(PLATE_ROWS) * len(PLATE_COLS)  # 384
+WELL_NAMES: Final = [[f"{r}{c}" for c in PLATE_COLS] for r in PLATE_ROWS]  # WELL_NAMES[row][col] -> "A1"
+
+
+def plate_name(plate_id: int) -> str:
+    return f"Plate {plate_id}"
+
+
+class PlateOverflowError(ValueError):
+    """Raised when labels run past the last plate row."""
+
+
+@dataclass(slots=True)
+class GeneBlock:
+    """One gene's wells on a fresh plate, column-wise; identical for every gene.
+
+    Group/Extras are None for non-sample wells.
+    """
+
+    wells: List[str] = field(default_factory=list)
+    types: List[str] = field(default_factory=list)
+    labels: List[str] = field(default_factory=list)
+    replicates: List[int] = field(default_factory=list)
+    groups: List[Optional[str]] = field(default_factory=list)
+    extras: List[Optional[List[str]]] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Layout:
+    """Placed wells stored column-wise; records() builds the row dicts for the response."""
+
+    plate_ids: List[int] = field(default_factory=list)  # 1-based plate numbers
+    wells: List[str] = field(default_factory=list)
+    genes: List[str] = field(default_factory=list)
+    types: List[str] = field(default_factory=list)
+    labels: List[str] = field(default_factory=list)
+    replicates: List[int] = field(default_factory=list)
+    groups: List[Optional[str]] = field(default_factory=list)
+    extras: List[Optional[List[str]]] = field(default_factory=list)
+    used: Dict[int, int] = field(default_factory=dict)  # plate id -> wells, tallied per gene
+
+    def add_gene(self, plate_id: int, gene: str, block: GeneBlock) -> None:
+        n = len(block.wells)
+        self.used[plate_id] = self.used.get(plate_id, 0) + n
+        self.plate_ids.extend([plate_id] * n)
+        self.genes.extend([gene] * n)
+        self.wells.extend(block.wells)
+        self.types.extend(block.types)
+        self.labels.extend(block.labels)
+        self.replicates.extend(block.replicates)
+        self.groups.extend(block.groups)
+        self.extras.extend(block.extras)
+
+    def plate_counts(self) -> Dict[int, int]:
+        """Wells used per plate id, in order of first use."""
+        return dict(self.used)
+
+    def records(self) -> List[dict]:
+        names = {plate_id: plate_name(plate_id) for plate_id in dict.fromkeys(self.plate_ids)}
+        out: List[dict] = []
+        for plate_id, well, gene, label_type, lab, rep, group, extras in zip(
+            self.plate_ids, self.wells, self.genes, self.types,
+            self.labels, self.replicates, self.groups, self.extras,
+        ):
+            record = {
+                "Plate": names[plate_id],
+                "Well": well,
+                "Gene": gene,
+                "Type": label_type,
+                "Label": lab,
+                "Replicate": rep,
+            }
+            if label_type == "Sample":
+                if group:  # omitted rather than sent as "" for ungrouped samples
+                    record["Group"] = group
+                record["Extras"] = extras
+            out.append(record)
+        return out
+
+
+def plate_positions(n_labels: int, replicates: int) -> List[Tuple[int, int]]:
+    """Return (row, first column) of each label's replicate run, starting at A1.
+
+    Replicates stay adjacent in one row; a label whose run would not fit wraps
+    to the start of the next row, so every row holds exactly labels_per_row runs.
+    """
+
+    labels_per_row = WELLS_PER_ROW // replicates
+    if n_labels > len(PLATE_ROWS) * labels_per_row:
+        raise PlateOverflowError("Plate overflow while placing wells.")
+    positions: List[Tuple[int, int]] = []
+    for i in range(n_labels):
+        row_idx, slot = divmod(i, labels_per_row)
+        positions.append((row_idx, slot * replicates))
+    return positions
+
+
+def build_gene_block(
+    flat_labels: List[Tuple[str, str]],
+    positions: List[Tuple[int, int]],
+    replicates: int,
+    group_map: Dict[str, str],
+    extras_map: Dict[str, List[str]],
+    empty_extras: List[str],
+) -> GeneBlock:
+    """Expand (type, label) pairs at their positions into one well per replicate.
+
+    extras_map is either empty (generated sample names) or has an entry for
+    every sample label, as returned by parse_samples.
+    """
+
+    # Sizes are known up front: fill preallocated columns one replicate run at a time.
+    n_wells = len(positions) * replicates
+    wells: List[str] = [""] * n_wells
+    types: List[str] = [""] * n_wells
+    labels: List[str] = [""] * n_wells
+    groups: List[Optional[str]] = [None] * n_wells  # None for non-sample wells
+    extras: List[Optional[List[str]]] = [None] * n_wells
+    get_group = group_map.get
+    well_names = WELL_NAMES
+    start = 0
+    for (label_type, lab), (row_idx, col_idx) in zip(flat_labels, positions):
+        end = start + replicates
+        wells[start:end] = well_names[row_idx][col_idx:col_idx + replicates]
+        types[start:end] = [label_type] * replicates
+        labels[start:end] = [lab] * replicates
+        if label_type == "Sample":
+            groups[start:end] = [get_group(lab, "")] * replicates
+            # A pasted list has an (already padded) entry for every sample label.
+            extras[start:end] = [extras_map[lab] if extras_map else empty_extras] * replicates
+        start = end
+    rep_numbers = list(range(1, replicates + 1)) * len(positions)
+    return GeneBlock(wells, types, labels, rep_numbers, groups, extras)
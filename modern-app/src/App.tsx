@@ -49,7 +49,7 @@ type PlanResponse = {
   layout: LayoutRow[]
   mix: MixRow[]
   summary: SummaryRow[]
-  inputs: Record<string, unknown>
+  inputs?: Record<string, unknown>
   sample_headers?: string[]
 }
 
@@ -1,8 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import webbrowser, os, tempfile, csv, re
-from collections import namedtuple, defaultdict, OrderedDict
-from math import ceil
+import webbrowser, os, tempfile, csv, io, re
+from collections import namedtuple, Counter, OrderedDict
 
 try:
     import pandas as pd
@@ -15,6 +14,7 @@ PLATE_ROWS = list("ABCDEFGHIJKLMNOP")    # 16 rows
 PLATE_COLS = list(range(1, 25))          # 24 cols
 WELLS_PER_ROW = len(PLATE_COLS)          # 24
 WELLS_PER_PLATE = len(PLATE_ROWS) * len(PLATE_COLS)  # 384
+WELL_NAMES = tuple(tuple(f"{r}{c}" for c in PLATE_COLS) for r in PLATE_ROWS)  # WELL_NAMES[row][col] -> "A1"
 
 # Per 15 µl reaction (13 µl master mix + 2 µl cDNA)
 Chem = namedtuple("Chem", ["name", "per_sample"])
@@ -34,6 +34,8 @@ CHEMISTRY = {
         "10 µM Reverse": 0.3
     })
 }
+REAGENTS = ("2X master mix", "RNAse-free H2O", "10 µM probe", "10 µM Forward", "10 µM Reverse")
+CHEM_VECTORS = {k: tuple(c.per_sample[r] for r in REAGENTS) for k, c in CHEMISTRY.items()}  # per-rxn µl, REAGENTS order
 REACTION_VOL = 15.0
 CDNA_PER_WELL = 2.0
 MASTER_MIX_PER_WELL = REACTION_VOL - CDNA_PER_WELL  # 13 µl
@@ -56,6 +58,57 @@ HELP = (
     "• Mix overage is a PERCENTAGE that increases master-mix totals only (does NOT add wells)\n"
 )
 
+# Gene colours (plate view + printable HTML), assigned in sorted gene order
+PALETTE = ("#8dd3c7","#ffffb3","#bebada","#fb8072","#80b1d3","#fdb462",
+           "#b3de69","#fccde5","#d9d9d9","#bc80bd","#ccebc5","#ffed6f")
+
+# Printable layout page; print_html fills {legend} and {plates}.
+HTML_SHELL = """<!doctype html>
+<html><head><meta charset="utf-8"><title>qPCR Plate Layout</title>
+<style>
+body {{ font-family: Arial, sans-serif; margin: 16px; }}
+h1 {{ font-size: 20px; margin: 6px 0 12px; }}
+h2 {{ font-size: 16px; margin: 12px 0 4px; }}
+.plate {{ border-collapse: collapse; margin-bottom: 16px; }}
+.plate th, .plate td {{ border: 1px solid #888; padding: 4px; font-size: 11px; text-align: center; }}
+.plate th {{ background: #f0f0f0; }}
+.plate td.empty {{ background: #fff; }}
+.legend .sw {{ display:inline-block; width:14px; height:14px; border:1px solid #666; margin-right:4px; vertical-align:middle; }}
+@media print {{ @page {{ size: A4 landscape; margin: 8mm; }} }}
+</style></head>
+<body onload="window.print()">
+<h1>qPCR Plate Layout (384-well)</h1>
+{legend}
+{plates}
+</body></html>"""
+
+# Column order of the layout exports (TSV copy, CSV, Excel Plate sheet).
+PLATE_HEADERS = ["Plate","Well","Gene","Type","Label","Replicate","Group"]
+
+def _xl_col_name(col_idx):
+    """0-based column index -> Excel letter(s): 0 -> A, 26 -> AA."""
+    letters = ""
+    while col_idx >= 0:
+        letters = chr(col_idx % 26 + ord('A')) + letters
+        col_idx = col_idx // 26 - 1
+    return letters
+
+# Template sheet columns: Gene Type Label Group r1..rN Avg, with N <= WELLS_PER_ROW
+XL_COLS = tuple(_xl_col_name(i) for i in range(4 + WELLS_PER_ROW + 1))
+
+_SAMPLE_SPLIT = re.compile(r"[\t, ]+")
+
+# Fixed trailing sections; optional ones are included by multiplying with 0/1.
+_RT_SEC = (("Negative", ("RT−",)),)
+_RNA_SEC = (("Negative", ("RNA−",)),)
+_BLANK_SEC = (("Blank", ("Blank",)),)
+
+def seq_labels(prefix, n):
+    """prefix1..prefixN, formatted in one %-pass instead of n f-strings."""
+    if n <= 0:
+        return []
+    return ((prefix + "%d ") * n % tuple(range(1, n + 1))).split()
+
 def letters_series(n):
     out = []
     i = 0
@@ -64,6 +117,19 @@ def letters_series(n):
         i += 1
     return out[:n]
 
+def label_positions(n_labels, reps):
+    """(row offset, first column) of each label's replicate run within one gene block.
+
+    Replicates stay adjacent; a label that would not fit wraps to the next row,
+    so every row holds exactly WELLS_PER_ROW // reps runs.
+    """
+    labels_per_row = WELLS_PER_ROW // reps
+    positions = []
+    for i in range(n_labels):
+        row, slot = divmod(i, labels_per_row)
+        positions.append((row, slot * reps))
+    return positions
+
 class GeneConfigFrame(ttk.Frame):
     def __init__(self, master, index, gene_name="", chemistry="SYBR"):
         super().__init__(master)
@@ -117,15 +183,8 @@ class PlateCanvas(ttk.Frame):
         self.colors = colors
         self.plates = {}
         for name, rows in plates.items():
-            cellmap = {}
-            for r in rows:
-                well = r["Well"]
-                row_letter = well[0]
-                col = int(well[1:])
-                ri = PLATE_ROWS.index(row_letter)
-                ci = PLATE_COLS.index(col)
-                cellmap[(ri, ci)] = r
-            self.plates[name] = cellmap
+            # compute() stores each record's 0-based grid position as _row/_col
+            self.plates[name] = {(r["_row"], r["_col"]): r for r in rows}
         names = list(self.plates.keys())
         self.plate_cb["values"] = names
         if names:
@@ -269,6 +328,10 @@ class App(tk.Tk):
         self._last_layout = []
         self._last_mix = []
         self._plates_dict = {}
+        self._plate_order = []  # plate names by number, set by compute()
+        self._color_cache_key = ()  # sorted genes the cached colours were built for
+        self._color_cache = {}      # gene -> colour
+        self._last_key = None       # inputs of the layout currently shown (see compute)
         self._sample_group_map = OrderedDict()  # name -> group (if any)
         self._replicates = 2
 
@@ -304,7 +367,11 @@ class App(tk.Tk):
             return names, mapping
         lines = [ln for ln in txt.splitlines() if ln.strip() and not ln.strip().startswith("#")]
         for ln in lines:
-            parts = [p for p in re.split(r"[\t, ]+", ln.strip()) if p != ""]
+            ln = ln.strip()
+            if "\t" in ln and "," not in ln and " " not in ln:
+                parts = [p for p in ln.split("\t") if p]  # tab-only line: plain split is enough
+            else:
+                parts = [p for p in _SAMPLE_SPLIT.split(ln) if p]
             if not parts: continue
             name = parts[0]
             group = parts[1] if len(parts) > 1 else ""
@@ -324,7 +391,6 @@ class App(tk.Tk):
             place_gapdh  = bool(self.place_gapdh_separate_var.get())
             inc_rtneg    = bool(self.include_rtneg_var.get())
             inc_rnaneg   = bool(self.include_rnaneg_var.get())
-            self._replicates = reps
 
             if reps < 1:
                 raise ValueError("Replicates must be ≥ 1.")
@@ -341,7 +407,7 @@ class App(tk.Tk):
                     raise ValueError("You enabled 'Use pasted sample list' but nothing was parsed.")
                 num_samples = len(sample_names)
             else:
-                sample_names = [f"S{i}" for i in range(1, num_samples+1)]
+                sample_names = seq_labels("S", num_samples)
 
             self._sample_group_map = sample_group_map  # keep for Excel template
 
@@ -353,6 +419,12 @@ class App(tk.Tk):
                 if g in seen: raise ValueError(f"Duplicate gene: {g}")
                 seen.add(g)
 
+            # Same inputs as the layout already shown: keep it (and the UI) as is.
+            key = (num_stds, num_pos, reps, over_pct, place_gapdh, inc_rtneg, inc_rnaneg,
+                   tuple(sample_names), tuple(sample_group_map.items()), tuple(genes))
+            if key == self._last_key:
+                return
+
             # order genes; optionally force GAPDH to separate plates (start on new plate)
             gene_groups = []
             if place_gapdh:
@@ -364,41 +436,39 @@ class App(tk.Tk):
                 gene_groups.append(("Plate", genes))
 
             # Build layout plate by plate WITHOUT splitting a gene across plates
-            all_layout = []
-            all_mix = []
-            plates_dict = defaultdict(list)
+            placed_by_gene = []  # (gene, chemistry name, per-rxn µl, placed reactions); mix is built after placement
             plate_counter = 0  # global plate numbering
+            plate_counts = Counter()  # plate name -> wells used, tallied per placed gene
+
+            # Every gene gets the same sections, so build them (and their positions) once.
+            standards = tuple(seq_labels("Std", num_stds))
+            positives = tuple(seq_labels("Pos", num_pos))
+
+            # *** ORDER CHANGED HERE ***
+            sections = (
+                (("Sample", tuple(sample_names)),  # preserve user order
+                 ("Standard", standards),
+                 ("Positive", positives))
+                + _RT_SEC * int(inc_rtneg)
+                + _RNA_SEC * int(inc_rnaneg)
+                + _BLANK_SEC
+            )
+            # Labels are never empty; empty sections (e.g. 0 standards) add nothing here.
+            labels_flat = [(t, lab) for t, labs in sections for lab in labs]
+
+            total_labels = len(labels_flat)
+            rows_needed = -(-total_labels // labels_per_row)  # integer ceil-div
+            positions = label_positions(total_labels, reps)
+            # Every gene places the same block, so the layout size is known: fill by index.
+            all_layout = [None] * (len(genes) * total_labels * reps)
+            write_idx = 0
+            # Bound once for the per-well loop below.
+            get_group = sample_group_map.get
+            well_names = WELL_NAMES
 
             for _, group_genes in gene_groups:
                 row_idx = 0  # start at row 0 of a fresh plate
                 for gene, chem_key in group_genes:
-                    negatives = []
-                    if inc_rtneg:  negatives.append("RT−")
-                    if inc_rnaneg: negatives.append("RNA−")
-                    blanks = ["Blank"]
-
-                    samples   = sample_names[:]  # preserve user order
-                    standards = [f"Std{n}" for n in range(1, num_stds+1)]
-                    positives = [f"Pos{n}" for n in range(1, num_pos+1)] if num_pos > 0 else []
-
-                    # *** ORDER CHANGED HERE ***
-                    sections = [
-                        ("Sample", samples),
-                        ("Standard", standards),
-                    ]
-                    if positives:
-                        sections.append(("Positive", positives))
-                    sections.extend([
-                        ("Negative", ["RT−"] if inc_rtneg else []),
-                        ("Negative", ["RNA−"] if inc_rnaneg else []),
-                        ("Blank", blanks),
-                    ])
-                    # Remove empties (e.g., if controls disabled)
-                    sections = [(t, [x for x in xs if x]) for (t, xs) in sections]
-                    sections = [(t, xs) for (t, xs) in sections if xs]
-
-                    total_labels = sum(len(lbls) for _, lbls in sections)
-                    rows_needed = ceil(total_labels / labels_per_row)
                     if rows_needed > len(PLATE_ROWS):
                         raise ValueError(
                             f"Gene '{gene}' requires {total_labels} label groups × {reps} replicates "
@@ -415,92 +485,87 @@ class App(tk.Tk):
                         current_plate = f"Plate {plate_counter}"
 
                     chem = CHEMISTRY[chem_key]
-                    col_idx = 0
-                    placed_for_gene = 0
-
-                    def place_block(label_type, labels):
-                        nonlocal row_idx, col_idx, placed_for_gene
-                        for lab in labels:
-                            if col_idx + reps > WELLS_PER_ROW:
-                                col_idx = 0
-                                row_idx += 1
-                            if row_idx >= len(PLATE_ROWS):
-                                raise RuntimeError("Unexpected overflow after pre-check.")
-                            for r in range(reps):
-                                well = f"{PLATE_ROWS[row_idx]}{PLATE_COLS[col_idx + r]}"
-                                record = {
-                                    "Plate": current_plate, "Well": well, "Gene": gene,
-                                    "Type": label_type, "Label": lab, "Replicate": r+1
-                                }
-                                # attach Group for samples (if pasted map provided)
-                                if label_type == "Sample":
-                                    record["Group"] = sample_group_map.get(lab, "")
-                                all_layout.append(record)
-                                plates_dict[current_plate].append(record)
-                                placed_for_gene += 1
-                            col_idx += reps
-                            if col_idx >= WELLS_PER_ROW:
-                                col_idx = 0
-                                row_idx += 1
-
-                    for label_type, labels in sections:
-                        if labels:
-                            place_block(label_type, labels)
-
-                    # end gene: move to next row boundary
-                    if col_idx != 0:
-                        col_idx = 0
-                        row_idx += 1
-                    if row_idx > len(PLATE_ROWS):
-                        raise RuntimeError("Post-gene row index overflow.")
-
-                    # MIX totals
-                    n_rxn = placed_for_gene
-                    factor = 1.0 + (over_pct/100.0)
-                    mix_equiv_rxn = n_rxn * factor
-                    per = chem.per_sample
-                    all_mix.append({
-                        "Gene": gene,
-                        "Chemistry": chem.name,
-                        "Placed reactions": n_rxn,
-                        "Mix factor": f"{factor:.2f}×",
-                        "Mix-equivalent reactions": f"{mix_equiv_rxn:.1f}",
-                        "2X master mix":  per["2X master mix"]  * mix_equiv_rxn,
-                        "RNAse-free H2O": per["RNAse-free H2O"] * mix_equiv_rxn,
-                        "10 µM probe":    per["10 µM probe"]    * mix_equiv_rxn,
-                        "10 µM Forward":  per["10 µM Forward"]  * mix_equiv_rxn,
-                        "10 µM Reverse":  per["10 µM Reverse"]  * mix_equiv_rxn,
-                    })
 
-            # --- Fill UI ---
-            for i in self.mix_tree.get_children(): self.mix_tree.delete(i)
-            for row in all_mix:
-                self.mix_tree.insert("", "end", values=[
-                    row["Gene"], row["Chemistry"], row["Placed reactions"], row["Mix factor"], row["Mix-equivalent reactions"],
-                    f'{row["2X master mix"]:.1f}', f'{row["RNAse-free H2O"]:.1f}',
-                    f'{row["10 µM probe"]:.1f}', f'{row["10 µM Forward"]:.1f}', f'{row["10 µM Reverse"]:.1f}',
-                ])
+                    for (label_type, lab), (row_off, col_idx) in zip(labels_flat, positions):
+                        grid_row = row_idx + row_off
+                        well_row = well_names[grid_row]
+                        for r in range(reps):
+                            # _row/_col: 0-based grid position for the plate views (not exported)
+                            record = {
+                                "Plate": current_plate, "Well": well_row[col_idx + r], "Gene": gene,
+                                "Type": label_type, "Label": lab, "Replicate": r+1,
+                                "_row": grid_row, "_col": col_idx + r,
+                            }
+                            # attach Group for samples that have one (exports fill the gap with "")
+                            if label_type == "Sample":
+                                group = get_group(lab, "")
+                                if group:
+                                    record["Group"] = group
+                            all_layout[write_idx] = record
+                            write_idx += 1
+                    placed_for_gene = len(labels_flat) * reps
+                    plate_counts[current_plate] += placed_for_gene
+
+                    # end gene: the next gene starts on a fresh row
+                    row_idx += rows_needed
+                    placed_by_gene.append((gene, chem.name, CHEM_VECTORS[chem_key], placed_for_gene))
+
+            # MIX totals: one overage factor (and its label) for every gene
+            factor = 1.0 + (over_pct/100.0)
+            factor_label = f"{factor:.2f}×"
+            all_mix = []
+            for gene, chem_name, per_rxn, n_rxn in placed_by_gene:
+                mix_equiv_rxn = n_rxn * factor
+                mix_row = {
+                    "Gene": gene,
+                    "Chemistry": chem_name,
+                    "Placed reactions": n_rxn,
+                    "Mix factor": factor_label,
+                    "Mix-equivalent reactions": f"{mix_equiv_rxn:.1f}",
+                }
+                mix_row.update(zip(REAGENTS, [per * mix_equiv_rxn for per in per_rxn]))
+                all_mix.append(mix_row)
+
+            # Plate numbers only increase, so each plate is one contiguous run of all_layout
+            # and the tally is already in plate-number order: no name parsing/sort.
+            plates_dict = {}
+            start = 0
+            for p, n in plate_counts.items():
+                plates_dict[p] = all_layout[start:start + n]
+                start += n
+            plate_order = list(plates_dict)
 
-            used_by_plate = {p: len(rows) for p, rows in plates_dict.items()}
-            lines = []
-            if not used_by_plate:
-                lines.append("No wells placed.")
-            else:
-                for p in sorted(plates_dict.keys(), key=lambda x: int(x.split()[1])):
-                    n = used_by_plate[p]
-                    lines.append(f"{p}: {n} used / 384; empty {384-n}.")
-            self.summary_text.delete("1.0","end")
-            self.summary_text.insert("1.0", "\n".join(lines) + "\n\n" + HELP)
-
-            genes_all = sorted({row["Gene"] for row in all_layout})
-            palette = ["#8dd3c7","#ffffb3","#bebada","#fb8072","#80b1d3","#fdb462",
-                       "#b3de69","#fccde5","#d9d9d9","#bc80bd","#ccebc5","#ffed6f"]
-            colors = {g: palette[i % len(palette)] for i, g in enumerate(genes_all)}
+            # --- Fill UI ---
+            mix_values = [(
+                row["Gene"], row["Chemistry"], row["Placed reactions"], row["Mix factor"], row["Mix-equivalent reactions"],
+                f'{row["2X master mix"]:.1f}', f'{row["RNAse-free H2O"]:.1f}',
+                f'{row["10 µM probe"]:.1f}', f'{row["10 µM Forward"]:.1f}', f'{row["10 µM Reverse"]:.1f}',
+            ) for row in all_mix]
+            children = self.mix_tree.get_children()
+            if children:
+                self.mix_tree.delete(*children)  # one Tk call for the whole table
+            insert = self.mix_tree.insert
+            for values in mix_values:
+                insert("", "end", values=values)
+
+            summary = "\n".join(
+                f"{p}: {plate_counts[p]} used / 384; empty {384-plate_counts[p]}." for p in plate_order
+            ) if plate_order else "No wells placed."
+            self.summary_text.replace("1.0", "end", summary + "\n\n" + HELP)  # one Tk call, not delete + insert
+
+            genes_key = tuple(sorted({row["Gene"] for row in all_layout}))
+            if genes_key != self._color_cache_key:
+                self._color_cache = {g: PALETTE[i % len(PALETTE)] for i, g in enumerate(genes_key)}
+                self._color_cache_key = genes_key
+            colors = self._color_cache
             self.plate_view.set_data(plates_dict, colors)
 
             self._last_layout = all_layout
             self._last_mix = all_mix
             self._plates_dict = plates_dict
+            self._plate_order = plate_order
+            self._last_key = key
+            self._replicates = reps  # only for a layout that was placed (Template columns, XL_COLS)
 
         except Exception as e:
             messagebox.showerror("Error", str(e))
@@ -510,11 +575,12 @@ class App(tk.Tk):
         if not self._last_layout:
             messagebox.showinfo("Info", "No layout yet. Click Compute.")
             return
-        headers = ["Plate","Well","Gene","Type","Label","Replicate","Group"]
-        lines = ["\t".join(headers)]
-        for r in self._last_layout:
-            lines.append("\t".join(str(r.get(h, "")) for h in headers))
-        tsv = "\n".join(lines)
+        headers = PLATE_HEADERS
+        buf = io.StringIO()
+        w = csv.writer(buf, delimiter="\t", lineterminator="\n")
+        w.writerow(headers)
+        w.writerows([r.get(h, "") for h in headers] for r in self._last_layout)
+        tsv = buf.getvalue()[:-1]  # no trailing newline on the clipboard
         self.clipboard_clear(); self.clipboard_append(tsv); self.update()
         messagebox.showinfo("Copied", "Plate layout copied to clipboard (TSV).")
 
@@ -524,12 +590,11 @@ class App(tk.Tk):
             return
         path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV","*.csv")])
         if not path: return
-        headers = ["Plate","Well","Gene","Type","Label","Replicate","Group"]
+        headers = PLATE_HEADERS
         try:
             with open(path, "w", newline="", encoding="utf-8") as f:
                 w = csv.writer(f); w.writerow(headers)
-                for r in self._last_layout:
-                    w.writerow([r.get(h, "") for h in headers])
+                w.writerows([r.get(h, "") for h in headers] for r in self._last_layout)
             messagebox.showinfo("Saved", f"Saved CSV:\n{path}")
         except Exception as e:
             messagebox.showerror("Error", str(e))
@@ -544,70 +609,59 @@ class App(tk.Tk):
         path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel","*.xlsx")])
         if not path: return
         try:
-            df_plate = pd.DataFrame(self._last_layout)
             df_mix = pd.DataFrame(self._last_mix)
 
             # Build Template sheet rows: one row per (Gene, Type, Label) in appearance order
             reps = self._replicates
             cols = ["Gene","Type","Label","Group"] + [f"r{i}" for i in range(1, reps+1)] + ["Avg"]
-            rows = []
-            seen_keys = set()
-            for rec in self._last_layout:
-                key = (rec["Gene"], rec["Type"], rec["Label"])
-                if key in seen_keys:
-                    continue
-                seen_keys.add(key)
-                rows.append({
-                    "Gene": rec["Gene"],
-                    "Type": rec["Type"],
-                    "Label": rec["Label"],
-                    "Group": (rec.get("Group","") if rec["Type"]=="Sample" else "")
-                })
-            df_template = pd.DataFrame(rows, columns=["Gene","Type","Label","Group"])
-            # add empty replicate cols + Avg placeholder (will overwrite with formulas)
-            for i in range(1, reps+1):
-                df_template[f"r{i}"] = ""
-            df_template["Avg"] = ""
+            df_template = (
+                pd.DataFrame(self._last_layout, columns=["Gene","Type","Label","Group"])
+                .drop_duplicates(subset=["Gene","Type","Label"], keep="first")
+                .reset_index(drop=True)
+            )
+            # Group only for samples; ungrouped samples have no key (NaN here)
+            df_template["Group"] = df_template["Group"].where(df_template["Type"] == "Sample", "").fillna("")
+            # add empty replicate cols (NaN is written as a blank cell)
+            df_template = df_template.reindex(columns=cols)
+
+            # Avg = AVERAGE over the replicate columns, written by to_excel in the same
+            # pass as the rest of the sheet (xlsxwriter turns "=..." strings into formulas).
+            # Columns: Gene(0) Type(1) Label(2) Group(3) r1(4) ... rN(3+reps) Avg(4+reps)
+            first_r_col = 4
+            last_r_col = 3 + reps
+            c1, c2 = XL_COLS[first_r_col], XL_COLS[last_r_col]
+            # Excel is 1-based and header is row 1
+            df_template["Avg"] = [f"=AVERAGE({c1}{r}:{c2}{r})" for r in range(2, len(df_template) + 2)]
 
             with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
-                # Plate + MM
-                df_plate.to_excel(writer, sheet_name="Plate", index=False)
+                wb = writer.book
+                header = wb.add_format({"bold": True, "bg_color": "#E6F3FF", "border": 1})
+                cell = wb.add_format({"border": 1})
+                # Plate: the bulk sheet, written row by row straight through xlsxwriter
+                ws_plate = wb.add_worksheet("Plate")
+                ws_plate.write_row(0, 0, PLATE_HEADERS, header)
+                write_row = ws_plate.write_row
+                for i, rec in enumerate(self._last_layout, start=1):
+                    write_row(i, 0, [rec.get(h, "") for h in PLATE_HEADERS])
+
+                # MM
                 df_mix.to_excel(writer, sheet_name="MasterMix", index=False)
 
                 # Template
                 df_template.to_excel(writer, sheet_name="Template", index=False)
-                wb = writer.book
-                for name, df in (("Plate", df_plate), ("MasterMix", df_mix), ("Template", df_template)):
-                    ws = writer.sheets[name]
-                    header = wb.add_format({"bold": True, "bg_color": "#E6F3FF", "border": 1})
-                    cell = wb.add_format({"border": 1})
+                wide_cols = ("Plate","Well","Gene","Type","Label","Group")
+                for ws, columns in ((ws_plate, PLATE_HEADERS),
+                                    (writer.sheets["MasterMix"], df_mix.columns),
+                                    (writer.sheets["Template"], df_template.columns)):
                     ws.set_row(0, None, header)
-                    for col, col_name in enumerate(df.columns):
-                        width = 16
-                        if col_name in ("Plate","Well","Gene","Type","Label","Group"): width = 18
-                        ws.set_column(col, col, width, cell)
-
-                # Insert AVERAGE formulas in Template! (beside replicates)
-                wsT = writer.sheets["Template"]
-                start_row = 1  # 0-based (row 1 is header)
-                nrows = len(df_template)
-                # Columns: Gene(0) Type(1) Label(2) Group(3) r1(4) ... rN(3+reps) Avg(4+reps)
-                first_r_col = 4
-                last_r_col = 3 + reps
-                avg_col = 4 + reps
-                # Helper to convert col index -> Excel letter(s)
-                def xl_col(col_idx):
-                    letters = ""
-                    while col_idx >= 0:
-                        letters = chr(col_idx % 26 + ord('A')) + letters
-                        col_idx = col_idx // 26 - 1
-                    return letters
-                for i in range(nrows):
-                    excel_row = i + 2  # Excel is 1-based and header is row 1
-                    c1 = xl_col(first_r_col) + str(excel_row)
-                    c2 = xl_col(last_r_col)  + str(excel_row)
-                    formula = f"=AVERAGE({c1}:{c2})"
-                    wsT.write_formula(i+1, avg_col, formula)
+                    # one set_column per run of equal-width columns
+                    widths = [18 if col_name in wide_cols else 16 for col_name in columns]
+                    first = 0
+                    for col in range(1, len(widths) + 1):
+                        if col == len(widths) or widths[col] != widths[first]:
+                            ws.set_column(first, col - 1, widths[first], cell)
+                            first = col
+
 
             messagebox.showinfo("Saved", f"Saved Excel with Template & Avg formulas:\n{path}")
         except Exception as e:
@@ -618,55 +672,45 @@ class App(tk.Tk):
             messagebox.showinfo("Info", "No layout yet. Click Compute.")
             return
 
-        genes = sorted({r["Gene"] for rows in self._plates_dict.values() for r in rows})
-        palette = ["#8dd3c7","#ffffb3","#bebada","#fb8072","#80b1d3","#fdb462",
-                   "#b3de69","#fccde5","#d9d9d9","#bc80bd","#ccebc5","#ffed6f"]
-        colors = {g: palette[i % len(palette)] for i, g in enumerate(genes)}
+        # compute() built these for exactly the genes in the current layout
+        genes = self._color_cache_key
+        colors = self._color_cache
+
+        # Per-print fragments: the column header row and each gene's opening cell tag.
+        header_row = "<tr><th></th>" + "".join(f"<th>{c}</th>" for c in PLATE_COLS) + "</tr>"
+        td_open = {g: f"<td style='background:{colors[g]}'>" for g in genes}
+        empty_td = "<td class='empty'></td>"
 
         def plate_table(pname, rows):
-            m = {(r["Well"][0], int(r["Well"][1:])): r for r in rows}
-            rows_html = [f"<h2>{pname}</h2>", "<table class='plate'>"]
-            rows_html.append("<tr><th></th>" + "".join(f"<th>{c}</th>" for c in PLATE_COLS) + "</tr>")
-            for rl in PLATE_ROWS:
-                tds = [f"<th>{rl}</th>"]
-                for c in PLATE_COLS:
-                    r = m.get((rl, c))
-                    if r:
-                        colr = colors[r['Gene']]
-                        label = f"{r['Gene']}<br><small>{r['Type']}: {r['Label']}, r{r['Replicate']}</small>"
-                        tds.append(f"<td style='background:{colr}'>{label}</td>")
-                    else:
-                        tds.append("<td class='empty'></td>")
-                rows_html.append("<tr>" + "".join(tds) + "</tr>")
-            rows_html.append("</table>")
-            return "\n".join(rows_html)
+            grid = [[None] * WELLS_PER_ROW for _ in PLATE_ROWS]  # grid[row][col] -> record or None
+            for r in rows:
+                grid[r["_row"]][r["_col"]] = r
+            parts = [f"<h2>{pname}</h2>", "<table class='plate'>", header_row]
+            ap = parts.append
+            for rl, cells in zip(PLATE_ROWS, grid):
+                tds = "".join([
+                    f"{td_open[r['Gene']]}{r['Gene']}<br><small>{r['Type']}: {r['Label']}, r{r['Replicate']}</small></td>"
+                    if r else empty_td
+                    for r in cells
+                ])
+                ap(f"<tr><th>{rl}</th>{tds}</tr>")
+            ap("</table>")
+            return "\n".join(parts)
 
         legend = "<div class='legend'><h3>Legend</h3>" + "".join(
             f"<span class='sw' style='background:{colors[g]}'></span> {g}&nbsp;&nbsp;" for g in genes
         ) + "</div>"
 
-        html = f"""<!doctype html>
-<html><head><meta charset="utf-8"><title>qPCR Plate Layout</title>
-<style>
-body {{ font-family: Arial, sans-serif; margin: 16px; }}
-h1 {{ font-size: 20px; margin: 6px 0 12px; }}
-h2 {{ font-size: 16px; margin: 12px 0 4px; }}
-.plate {{ border-collapse: collapse; margin-bottom: 16px; }}
-.plate th, .plate td {{ border: 1px solid #888; padding: 4px; font-size: 11px; text-align: center; }}
-.plate th {{ background: #f0f0f0; }}
-.plate td.empty {{ background: #fff; }}
-.legend .sw {{ display:inline-block; width:14px; height:14px; border:1px solid #666; margin-right:4px; vertical-align:middle; }}
-@media print {{ @page {{ size: A4 landscape; margin: 8mm; }} }}
-</style></head>
-<body onload="window.print()">
-<h1>qPCR Plate Layout (384-well)</h1>
-{legend}
-{"".join(plate_table(p, self._plates_dict[p]) for p in sorted(self._plates_dict, key=lambda x: int(x.split()[1])))}
-</body></html>"""
+        plates = "".join(plate_table(p, self._plates_dict[p]) for p in self._plate_order)
+        html = HTML_SHELL.format_map({"legend": legend, "plates": plates})
         try:
             fd, path = tempfile.mkstemp(suffix=".html", prefix="qpcr_plate_")
-            with os.fdopen(fd, "w", encoding="utf-8") as f:
-                f.write(html)
+            try:
+                data = memoryview(html.encode("utf-8"))
+                while data:  # os.write may write less than asked
+                    data = data[os.write(fd, data):]
+            finally:
+                os.close(fd)
             webbrowser.open_new_tab("file://" + path)
         except Exception as e:
             messagebox.showerror("Error", f"Could not open printable view:\n{e}")